@@ -23,13 +23,15 @@ from .lib import get_new_times
 from .tree_util import get_ages
 from .tree_util import get_birth_death_rates
 from .tree_util import get_min_age
+from .tree_util import get_monophyletic_node
 from .tree_util import get_short_branches
 from .tree_util import get_tip_labels
 from .tree_util import graft_node
+from .tree_util import graft_nodes
 from .tree_util import is_binary
 from .tree_util import is_fully_locked
 from .tree_util import lock_clade
-from .tree_util import update_tree_view
+from .tree_util import update_tree_view_local
 from .validation import validate_outgroups
 from .validation import validate_taxonomy_tree
 from .validation import BackboneCommand
@@ -131,6 +133,7 @@ def get_new_branching_times(backbone_node, taxonomy_node, told=None, tyoung=0, m
 
 
 def fill_new_taxa(namespace, node, new_taxa, times, stem=False):
+    new_nodes = []
     for new_species, new_age in zip(new_taxa, times):
         new_node = dendropy.Node()
         new_node.annotations.add_new("creation_method", "fill_new_taxa")
@@ -138,9 +141,10 @@ def fill_new_taxa(namespace, node, new_taxa, times, stem=False):
         new_leaf = new_node.new_child(taxon=namespace.require_taxon(new_species), edge_length=new_age)
         new_leaf.annotations.add_new("creation_method", "fill_new_taxa")
         new_leaf.age = 0
-        node = graft_node(node, new_node, stem)
+        new_nodes.append(new_node)
+    node = graft_nodes(node, new_nodes, stem)
 
-    count_short_branches = len(list(get_short_branches(node)))
+    count_short_branches = len(get_short_branches(node))
     if count_short_branches:
         logger.info(f"{count_short_branches} short branches detected")
 
@@ -183,8 +187,9 @@ def create_clade(namespace, species, ages):
     tree.set_edge_lengths_from_node_ages(error_on_negative_edge_lengths=True)
     # Lock the child of the seed node so that things can still attach to the stem of this new clade
     lock_clade(tree.seed_node.child_nodes()[0])
-    if list(get_short_branches(tree.seed_node)):
-        logger.info("{} short branches detected".format(len(list(get_short_branches(tree.seed_node)))))
+    short_branches = get_short_branches(tree.seed_node)
+    if short_branches:
+        logger.info(f"{len(short_branches)} short branches detected")
     return tree
 
 
@@ -252,6 +257,10 @@ def process_node(backbone_tree, backbone_bitmask, taxon_node, min_ccp, default_b
 
 def run_precalcs(taxonomy_tree, backbone_tree, min_ccp=0.8, yule=False):
     global mrca_rates
+    global invalid_map
+    # Start from scratch, since these persist across runs in the same process
+    mrca_rates = {}
+    invalid_map = {}
     tree_tips = get_tip_labels(backbone_tree)
     backbone_bitmask = fastmrca.bitmask(tree_tips)
     all_possible_tips = get_tip_labels(taxonomy_tree)
@@ -380,8 +389,9 @@ def main(taxonomy, backbone, outgroups, output, min_ccp, verbose, yule, ultramet
             bar_update()
             continue
 
-        # Check for monophyly for this node
-        node = fastmrca.get(extant_species)
+        # Check for monophyly for this node. Bipartitions go stale as clades are grafted and
+        # refreshed with `update_tree_view_local`, so don't use the bitmask-based `fastmrca.get`.
+        node = get_monophyletic_node(tree, extant_species)
         if not node:
             logger.info(f"    {taxon}: is not monophyletic")
             continue
@@ -452,7 +462,7 @@ def main(taxonomy, backbone, outgroups, output, min_ccp, verbose, yule, ultramet
             new_tree = create_clade(tn, full_node_species, times)
             # Update our current MRCA node (because we might have attached to stem)
             node = graft_node(node, new_tree.seed_node, is_fully_locked(node) or ccp < min_ccp)
-            tree_tips = update_tree_view(tree)
+            tree_tips = update_tree_view_local(tree, node)
             # Update our view of what's in the tree
             extant_species = tree_tips.intersection(species)
             # We've added this clade so pop it off our stack
@@ -472,11 +482,11 @@ def main(taxonomy, backbone, outgroups, output, min_ccp, verbose, yule, ultramet
 
         # Taxon spray
         logger.info(f"    {taxon}: adding {len(species.difference(extant_species))} new species")
-        node = fastmrca.get(extant_species)
+        node = get_monophyletic_node(tree, extant_species)
         times = get_new_branching_times(node, taxon_node, tyoung=get_min_age(node), min_ccp=min_ccp)
         node = fill_new_taxa(tn, node, species.difference(tree_tips), times, ccp < min_ccp)
         # Update stuff
-        tree_tips = update_tree_view(tree)
+        tree_tips = update_tree_view_local(tree, node)
         # Since only monophyletic nodes get to here, lock this clade
         lock_clade(node)
         if not is_binary(node):
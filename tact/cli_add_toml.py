@@ -25,7 +25,7 @@ from .tree_util import get_ages
 from .tree_util import get_birth_death_rates
 from .tree_util import get_min_age
 from .tree_util import get_tip_labels
-from .tree_util import graft_node
+from .tree_util import graft_nodes
 from .tree_util import is_binary
 from .tree_util import lock_clade
 from .tree_util import unlock_clade
@@ -162,6 +162,7 @@ def do_tact(tree, item):
 
     # TODO: currently does not account for the possibility of a disjoint set of edges.
     # If this happens, reroll the time?
+    new_nodes = []
     for idx, time in enumerate(times):
         new_name = f"{item.name} tact {idx}"
         logger.info(f"=> Grafting {new_name} @ {time}")
@@ -169,8 +170,9 @@ def do_tact(tree, item):
         new_node.age = time
         new_leaf = new_node.new_child(taxon=dendropy.Taxon(label=new_name), edge_length=time)
         new_leaf.age = 0
-        # Assume stem is fair game, since it would have been unlocked or kept locked earlier
-        mrca_node = graft_node(mrca_node, new_node, True)
+        new_nodes.append(new_node)
+    # Assume stem is fair game, since it would have been unlocked or kept locked earlier
+    mrca_node = graft_nodes(mrca_node, new_nodes, True)
 
     tree.reconstruct_taxon_namespace()
     update_tree_view(tree)
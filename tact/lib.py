@@ -6,7 +6,10 @@ from __future__ import division
 
 import random
 import sys
+from bisect import bisect_right
 from decimal import Decimal as D
+from functools import lru_cache
+from itertools import accumulate
 from math import exp
 from math import log
 
@@ -16,6 +19,9 @@ from scipy.optimize import minimize, minimize_scalar, dual_annealing
 # Raise on overflow
 np.seterr(all="raise")
 
+_FLOAT_MIN = sys.float_info.min
+_FLOAT_MAX = sys.float_info.max
+
 
 def get_bd(r, a):
     """
@@ -57,7 +63,9 @@ def wrapped_lik_constant(x, sampling, ages):
     Returns:
         (float): a likelihood
     """
-    return lik_constant(get_bd(*x), sampling, ages)
+    r, a = x
+    # Inlined `get_bd` to avoid an extra call and tuple unpack per likelihood evaluation
+    return lik_constant((-r / (a - 1), -a * r / (a - 1)), sampling, ages)
 
 
 def wrapped_lik_constant_yule(x, sampling, ages):
@@ -89,13 +97,25 @@ def two_step_optim(func, x0, bounds, args):
     Returns:
         params (tuple): optimized parameter values
     """
+    result = _local_optim(func, x0, bounds, args)
+    if result is not None:
+        return result
+    return _annealing_optim(func, x0, bounds, args)
+
+
+def _local_optim(func, x0, bounds, args):
+    """The L-BFGS-B step of `two_step_optim`, returning None if it fails."""
     try:
         result = minimize(func, x0=x0, bounds=bounds, args=args, method="L-BFGS-B")
         if result["success"]:
             return result["x"].tolist()
     except FloatingPointError:
         pass
+    return None
+
 
+def _annealing_optim(func, x0, bounds, args):
+    """The simulated annealing step of `two_step_optim`."""
     result = dual_annealing(func, x0=x0, bounds=bounds, args=args)
     if result["success"]:
         return result["x"].tolist()
@@ -103,12 +123,25 @@ def two_step_optim(func, x0, bounds, args):
     raise Exception(f"Optimization failed: {result['message']} (code {result['status']})")
 
 
+def _sorted_ages(ages):
+    """
+    Converts `ages` to a list of Python floats sorted from oldest to youngest.
+
+    Sorting once up front means `lik_constant` only has to verify the order on each
+    evaluation, and plain floats keep the likelihood arithmetic out of NumPy's error handling.
+    The sorted ages also serve as the memoization key for the deterministic optimizers behind
+    `optim_bd` and `optim_yule`, so identical clades (such as the same clade across
+    `tact_add_config` replicates) are only fit once.
+    """
+    return np.sort(np.asarray(ages, dtype=np.float64))[::-1].tolist()
+
+
 def optim_bd(ages, sampling, min_bound=1e-9):
     """
     Optimizes birth and death parameters given a vector of splitting times and sampling fraction.
 
     Args:
-        ages (list): vector of node ages
+        ages (list or ndarray): vector of node ages
         sampling (float): sampling fraction (0, 1]
         min_bound (float): minimum birth rate
 
@@ -116,15 +149,34 @@ def optim_bd(ages, sampling, min_bound=1e-9):
         birth (float): optimized birth rate.
         death (float): optimized death rate.
     """
+    ages = tuple(_sorted_ages(ages))
+    result = _optim_bd_local(ages, sampling, min_bound)
+    if result is None:
+        # Simulated annealing is stochastic, so unlike the L-BFGS-B fit it is never memoized
+        x0, bounds = _optim_bd_start(ages, sampling, min_bound)
+        result = _annealing_optim(wrapped_lik_constant, x0=x0, bounds=bounds, args=(sampling, list(ages)))
+    return get_bd(*result)
+
+
+def _optim_bd_start(ages, sampling, min_bound):
+    """Returns the initial conditions and bounds used to fit `optim_bd`."""
     if max(ages) < 0.000001:
         init_r = 1e-3
     else:
         # Magallon-Sanderson crown estimator
         init_r = (log((len(ages) + 1) / sampling) - log(2)) / max(ages)
         init_r = max(1e-3, init_r)
-    bounds = ((min_bound, 100), (0, 1 - min_bound))
-    result = two_step_optim(wrapped_lik_constant, x0=(init_r, min_bound), bounds=bounds, args=(sampling, ages))
-    return get_bd(*result)
+    return (init_r, min_bound), ((min_bound, 100), (0, 1 - min_bound))
+
+
+@lru_cache(maxsize=1024)
+def _optim_bd_local(ages, sampling, min_bound):
+    """Memoized L-BFGS-B fit for `optim_bd`, taking `ages` as a sorted tuple. Returns None if it fails."""
+    x0, bounds = _optim_bd_start(ages, sampling, min_bound)
+    result = _local_optim(wrapped_lik_constant, x0=x0, bounds=bounds, args=(sampling, list(ages)))
+    if result is None:
+        return None
+    return tuple(result)
 
 
 def optim_yule(ages, sampling, min_bound=1e-9):
@@ -132,7 +184,7 @@ def optim_yule(ages, sampling, min_bound=1e-9):
     Optimizes birth parameter under a Yule model, given a vector of splitting times and sampling fraction.
 
     Args:
-        ages (list): vector of node ages
+        ages (list or ndarray): vector of node ages
         sampling (float): sampling fraction (0, 1]
         min_bound (float): minimum birth rate
 
@@ -140,6 +192,13 @@ def optim_yule(ages, sampling, min_bound=1e-9):
         birth (float): optimized birth rate.
         death (float): optimized death rate. Always 0.
     """
+    return _optim_yule(tuple(_sorted_ages(ages)), sampling, min_bound)
+
+
+@lru_cache(maxsize=1024)
+def _optim_yule(ages, sampling, min_bound):
+    """Memoized implementation of `optim_yule`, taking `ages` as a sorted tuple. The bounded fit is deterministic."""
+    ages = list(ages)
     bounds = (min_bound, 100)
     result = minimize_scalar(wrapped_lik_constant_yule, bounds=bounds, args=(sampling, ages), method="Bounded")
     if result["success"]:
@@ -170,8 +229,9 @@ def p1_exact(t, l, m, rho):  # noqa: E741
     l = D(l)  # noqa: E741
     m = D(m)
     rho = D(rho)
-    num = rho * (l - m) ** D(2) * (-(l - m) * t).exp()
-    denom = (rho * l + (l * (1 - rho) - m) * (-(l - m) * t).exp()) ** D(2)
+    ert = (-(l - m) * t).exp()
+    num = rho * (l - m) ** D(2) * ert
+    denom = (rho * l + (l * (1 - rho) - m) * ert) ** D(2)
     return num / denom
 
 
@@ -192,14 +252,26 @@ def p1(t, l, m, rho):  # noqa: E741
     """
     Optimized version of `p1_orig` using common subexpression elimination and strength reduction
     from exponentiation to multiplication.
+
+    Uses `math.exp` and plain float arithmetic rather than NumPy scalars, which are much slower
+    to dispatch. Plain floats silently underflow or overflow where NumPy would raise, so any
+    result that passes through a non-normal value is recomputed exactly instead.
     """
     try:
-        ert = np.exp(-(l - m) * t, dtype=np.float64)
+        ert = exp(-(l - m) * t)
         num = rho * (l - m) ** 2 * ert
         denom = (rho * l + (l * (1 - rho) - m) * ert) ** 2
         res = num / denom
-    except (OverflowError, FloatingPointError):
+    except (OverflowError, ZeroDivisionError, FloatingPointError):
         res = float(p1_exact(t, l, m, rho))
+    else:
+        # An exact zero numerator (when `l == m`) is not an underflow, so it doesn't need the exact fallback
+        if not (
+            _FLOAT_MIN <= ert
+            and (num == 0.0 or _FLOAT_MIN <= num <= _FLOAT_MAX)
+            and _FLOAT_MIN <= denom <= _FLOAT_MAX
+        ):
+            res = float(p1_exact(t, l, m, rho))
     if res == 0.0:
         return sys.float_info.min
     return res
@@ -210,8 +282,9 @@ def intp1_exact(t, l, m):  # noqa: E741
     l = D(l)  # noqa: E741
     m = D(m)
     t = D(t)
-    num = D(1) - (-(l - m) * t).exp()
-    denom = l - m * (-(l - m) * t).exp()
+    ert = (-(l - m) * t).exp()
+    num = D(1) - ert
+    denom = l - m * ert
     return num / denom
 
 
@@ -246,8 +319,13 @@ def lik_constant(vec, rho, t, root=1, survival=1, p1=p1):
     m = vec[1]
     t.sort(reverse=True)
     lik = (root + 1) * log(p1(t[0], l, m, rho))
+    if len(t) > 1:
+        # log(l) is constant across waiting times, so only compute it once
+        lik += (len(t) - 1) * log(l)
+    # Bind `log` locally since this loop is the innermost hot path of the optimizer
+    _log = log
     for tt in t[1:]:
-        lik += log(l) + log(p1(tt, l, m, rho))
+        lik += _log(p1(tt, l, m, rho))
     if survival == 1:
         lik -= (root + 1) * log(1 - p0(t[0], l, m, rho))
     return -lik
@@ -277,7 +355,6 @@ def crown_capture_probability(n, k):
     return 1 - 2 * (n - k) / ((n - 1) * (k + 1))
 
 
-# TODO: This could probably be optimized
 def get_new_times(ages, birth, death, missing, told=None, tyoung=None):
     """
     Simulates new speciation events in an incomplete phylogeny assuming a
@@ -290,7 +367,7 @@ def get_new_times(ages, birth, death, missing, told=None, tyoung=None):
     non-randomly sampled phylogenies. Syst. Biol., 61(5): 785-792, 2012.
 
     Args:
-        ages (list): vector of waiting times
+        ages (list or ndarray): vector of waiting times
         birth (float): birth rate
         death (float): death rate
         missing (int): number of missing taxa to simulate
@@ -300,46 +377,49 @@ def get_new_times(ages, birth, death, missing, told=None, tyoung=None):
     Returns:
         (list): vector of simulated waiting times.
     """
+    ages = _sorted_ages(ages)
     if told is None:
         told = max(ages)
+    told = float(told)
     if len(ages) > 0:
         if max(ages) > told and abs(max(ages) - told) > sys.float_info.epsilon:
             raise Exception("Zero or negative branch lengths detected in backbone phylogeny")
     if tyoung is None:
         tyoung = 0
 
-    ages.sort(reverse=True)
     times = [x for x in ages if told >= x >= tyoung]
     times = [told] + times + [tyoung]
-    ranks = range(0, len(times))
+    if missing <= 0:
+        return []
+
+    # The integrated probabilities only depend on `times`, so they are shared by every draw
+    intp = [intp1(x, birth, death) for x in times]
+    cdf = None
+    if len(times) > 2:
+        distrranks = [i * (intp[i - 1] - intp[i]) for i in range(1, len(times))]
+        try:
+            dsum = sum(distrranks)
+            cdf = list(accumulate(x / dsum for x in distrranks))
+        except ZeroDivisionError:
+            cdf = None
+
+    # A rank variate is only drawn when there is a rank distribution to sample from, so that
+    # seeded runs consume the random stream exactly as the original implementation did
     only_new = []
-    while missing > 0:
-        if len(ranks) > 2:
-            distrranks = []
-            for i in range(1, len(ranks)):
-                temp = ranks[i] * (intp1(times[i - 1], birth, death) - intp1(times[i], birth, death))
-                distrranks.append(temp)
-            try:
-                dsum = sum(distrranks)
-                distrranks = [x / dsum for x in distrranks]
-                for i in range(1, len(distrranks)):
-                    distrranks[i] = distrranks[i] + distrranks[i - 1]
-                r = random.uniform(0, 1)
-                addrank = min([idx for idx, x in enumerate(distrranks) if x > r])
-            except ZeroDivisionError:
-                addrank = 0
-            except ValueError:
-                addrank = 0
-        else:
+    for _ in range(missing):
+        if cdf is None:
             addrank = 0
-        r = random.uniform(0, 1)
-        const = intp1(times[addrank], birth, death) - intp1(times[addrank + 1], birth, death)
+        else:
+            addrank = bisect_right(cdf, random.random())
+            if addrank == len(cdf):
+                addrank = 0
+        r = random.random()
+        const = intp[addrank] - intp[addrank + 1]
         try:
-            temp = intp1(times[addrank + 1], birth, death) / const
+            temp = intp[addrank + 1] / const
         except ZeroDivisionError:
             temp = 0.0
         xnew = 1 / (death - birth) * log((1 - (r + temp) * const * birth) / (1 - (r + temp) * const * death))
         only_new.append(xnew)
-        missing -= 1
     only_new.sort(reverse=True)
     return only_new
@@ -4,14 +4,28 @@
 
 import math
 import random
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import compress
 
 import dendropy
-import portion
+import numpy as np
 
 from .lib import optim_bd
 from .lib import optim_yule
 from .exceptions import DisjointConstraintError
 
+# Attributes cached on DendroPy nodes by `get_ages`, `get_tip_labels`, `get_monophyletic_node` and
+# `edge_iter`. Each is derived from the clade under its node, so it stays valid until that clade
+# changes: `graft_node` drops them from the graft and its ancestors with `_invalidate_up`, and
+# `update_tree_view` drops them from every node.
+_NODE_CACHE_ATTRS = ("_tact_ages", "_tact_tip_labels", "_tact_mrca_cache", "_tact_edges")
+
+# Locked edges are marked with the label "locked". Since lock checks run for every edge
+# in a clade, we read and write DendroPy's underlying `_label` attribute directly rather
+# than going through the `Edge.label` property.
+
 
 def get_birth_death_rates(node, sampfrac, yule=False, include_root=False):
     """
@@ -25,32 +39,113 @@ def get_birth_death_rates(node, sampfrac, yule=False, include_root=False):
     return optim_bd(get_ages(node, include_root), sampfrac)
 
 
+def get_leaf_index(tree):
+    """
+    Returns a `dict` mapping tip labels to leaf nodes in `tree`. The index is
+    cached on the tree until the next call to `update_tree_view`.
+    """
+    try:
+        return tree._tact_leaf_index
+    except AttributeError:
+        index = tree._tact_leaf_index = {x.taxon.label: x for x in tree.leaf_node_iter()}
+        return index
+
+
 def get_monophyletic_node(tree, species):
     """Returns the node or None that is the MRCA of the `species` in `tree`."""
-    mrca = tree.mrca(taxon_labels=species)
-    if mrca and species.issuperset(get_tip_labels(mrca)):
-        return mrca
+    species = frozenset(species)
+    root = tree.seed_node
+    try:
+        cache = root._tact_mrca_cache
+    except AttributeError:
+        cache = root._tact_mrca_cache = {}
+    try:
+        return cache[species]
+    except KeyError:
+        pass
+    node = cache[species] = _find_monophyletic_node(tree, species)
+    return node
+
+
+def _find_monophyletic_node(tree, species):
+    """
+    Uncached implementation of `get_monophyletic_node`.
+
+    Counts how many of the `species` each ancestor subtends; the first one that subtends
+    all of them is the MRCA, which is monophyletic only if it has no other tips.
+    """
+    if not species:
+        return None
+    index = get_leaf_index(tree)
+    if not species.issubset(index):
+        # leaves may have been grafted since the index was built
+        tree.__dict__.pop("_tact_leaf_index", None)
+        index = get_leaf_index(tree)
+        if not species.issubset(index):
+            raise KeyError("Not all labels matched to taxa")
+
+    leaves = [index[x] for x in species]
+    hits = defaultdict(int)
+    for leaf in leaves:
+        for anc in leaf.ancestor_iter(inclusive=True):
+            hits[id(anc)] += 1
+    for anc in leaves[0].ancestor_iter(inclusive=True):
+        if hits[id(anc)] == len(leaves):
+            if len(get_tip_labels(anc)) == len(leaves):
+                return anc
+            return None
 
     return None
 
 
 def get_ages(node, include_root=False):
     """
-    Returns the list of ages of the children of a given `node`,
-    optionally including the `node`'s age if `include_root` is True.
+    Returns a read-only NumPy array of the ages of the children of a given `node`, sorted from
+    oldest to youngest, optionally followed by the `node`'s age if `include_root` is True.
     """
-    ages = [x.age for x in node.ageorder_iter(include_leaves=False, descending=True)]
+    try:
+        cached = node._tact_ages
+    except AttributeError:
+        # Collecting ages with an explicit stack and sorting them with NumPy is
+        # much faster than DendroPy's `ageorder_iter`.
+        acc = array("d")
+        stack = [node]
+        while stack:
+            x = stack.pop()
+            if x._child_nodes:
+                acc.append(x.age)
+                stack.extend(x._child_nodes)
+        cached = node._tact_ages = np.frombuffer(acc, dtype=np.float64).copy()
+        cached[::-1].sort()
+        cached.flags.writeable = False
     if include_root:
-        ages += [node.age]
-    return ages
+        return np.append(cached, node.age)
+    return cached
 
 
 def get_tip_labels(tree_or_node):
-    """Returns a `set` of tip labels for a node or tree."""
+    """Returns a `frozenset` of tip labels for a node or tree."""
+    node = getattr(tree_or_node, "seed_node", tree_or_node)
     try:
-        return {x.taxon.label for x in tree_or_node.leaf_node_iter()}
+        return node._tact_tip_labels
     except AttributeError:
-        return {x.taxon.label for x in tree_or_node.leaf_iter()}
+        pass
+    if not node._child_nodes:
+        labels = node._tact_tip_labels = frozenset((node.taxon.label,))
+        return labels
+    # Fill in the clade in a single postorder pass, building each node's labels from
+    # its children's rather than walking the leaves again for every node.
+    stack = [(node, False)]
+    while stack:
+        x, ready = stack.pop()
+        if ready:
+            x._tact_tip_labels = frozenset().union(
+                *[(y.taxon.label,) if not y._child_nodes else y._tact_tip_labels for y in x._child_nodes]
+            )
+        elif "_tact_tip_labels" not in x.__dict__:
+            stack.append((x, True))
+            stack.extend((y, False) for y in x._child_nodes if y._child_nodes)
+    return node._tact_tip_labels
 
 
 def edge_iter(node, filter_fn=None):
@@ -58,12 +153,27 @@ def edge_iter(node, filter_fn=None):
     Iterates over the child edge of `node` and all its descendants.
     Can optionally be filtered by `filter_fn`.
     """
-    stack = list(node.child_edge_iter())
+    if filter_fn is None:
+        return iter(_clade_edges(node))
+    return filter(filter_fn, _clade_edges(node))
+
+
+def _clade_edges(node):
+    """Returns the cached list of edges under `node`, walking the clade on the first call."""
+    try:
+        return node._tact_edges
+    except AttributeError:
+        pass
+    # Walk DendroPy's child node lists directly rather than allocating a
+    # `child_edge_iter` generator for every node in the clade.
+    edges = []
+    stack = list(node._child_nodes)
     while stack:
-        edge = stack.pop()
-        if filter_fn is None or filter_fn(edge):
-            yield edge
-        stack.extend(edge.head_node.child_edge_iter())
+        child = stack.pop()
+        edges.append(child._edge)
+        stack.extend(child._child_nodes)
+    node._tact_edges = edges
+    return edges
 
 
 def get_tree(path, namespace=None):
@@ -80,18 +190,85 @@ def update_tree_view(tree):
     Mutates a DendroPy tree object with updated node ages and bipartition bitmask. We also
     correct for minor ultrametricity errors.
 
-    Returns a list of tip labels.
+    Returns a `frozenset` of tip labels.
     """
-    tree.calc_node_ages(is_force_max_age=True)
+    calc_node_ages(tree)
     tree.update_bipartitions()
+    tree.__dict__.pop("_tact_leaf_index", None)
+    for node in tree.preorder_node_iter():
+        _clear_node_caches(node)
     return get_tip_labels(tree)
 
 
+def calc_node_ages(tree):
+    """
+    Sets the `age` of every node in `tree` to the oldest age implied by its children and their
+    edge lengths, like DendroPy's `Tree.calc_node_ages(is_force_max_age=True)`.
+    """
+    _calc_clade_ages(tree.seed_node)
+
+
+def _calc_clade_ages(node):
+    """Sets the `age` of `node` and every node below it, as in `calc_node_ages`."""
+    # Walk DendroPy's child node lists directly to get a preorder, then fill in ages in reverse
+    # so every node is visited after its children.
+    order = []
+    stack = [node]
+    while stack:
+        x = stack.pop()
+        order.append(x)
+        stack.extend(x._child_nodes)
+    for x in reversed(order):
+        children = x._child_nodes
+        if children:
+            x.age = max([y.age + y._edge.length for y in children])
+        else:
+            x.age = 0.0
+
+
+def update_tree_view_local(tree, node):
+    """
+    Updates a DendroPy tree object after nodes were grafted only into the clade under `node`,
+    such as the crown returned by `graft_node`. This is much cheaper than `update_tree_view`
+    for large trees, since only the clade and its ancestors are revisited.
+
+    Node ages are recomputed for the clade and for its ancestors, stopping at the first ancestor
+    whose age is unchanged. Bipartition bitmasks are *not* updated; call `update_tree_view`
+    before relying on them.
+
+    Returns a `frozenset` of tip labels.
+    """
+    _calc_clade_ages(node)
+    _invalidate_up(node)
+    for anc in node.ancestor_iter():
+        age = max([x.age + x._edge.length for x in anc._child_nodes])
+        if age == anc.age:
+            break
+        anc.age = age
+    return get_tip_labels(tree)
+
+
+def _clear_node_caches(node):
+    """Drops any values cached on `node`."""
+    for attr in _NODE_CACHE_ATTRS:
+        node.__dict__.pop(attr, None)
+
+
+def _invalidate_up(node):
+    """Drops the values cached on `node` and each of its ancestors, after its clade has been modified."""
+    for x in node.ancestor_iter(inclusive=True):
+        _clear_node_caches(x)
+
+
 def is_binary(node):
-    """Is the subtree under `node` a fully bifurcating tree?"""
-    for internal_node in node.preorder_internal_node_iter():
-        if len(internal_node.child_nodes()) != 2:
-            return False
+    """Is the subtree under `node` (or a whole tree) a fully bifurcating tree?"""
+    stack = [getattr(node, "seed_node", node)]
+    while stack:
+        children = stack.pop()._child_nodes
+        if children:
+            if len(children) != 2:
+                return False
+            stack.extend(children)
     return True
 
 
@@ -100,31 +277,50 @@ def is_ultrametric(tree, tolerance=1e-6):
 
     Uses the relative difference between minimum and maximum root-to-tip distances.
     """
-    tree.calc_node_root_distances()
-    lengths = {}
-    for leaf in tree.leaf_node_iter():
-        lengths[leaf.taxon.label] = leaf.root_distance
-    t_min = min(lengths.items(), key=lambda x: x[1])
-    t_max = max(lengths.items(), key=lambda x: x[1])
+    t_min = (None, math.inf)
+    t_max = (None, -math.inf)
+    # Accumulate root-to-tip distances in a single preorder pass, rather than storing
+    # `root_distance` on every node and then walking the leaves again.
+    stack = [(tree.seed_node, 0.0)]
+    while stack:
+        node, dist = stack.pop()
+        children = node._child_nodes
+        if children:
+            stack.extend((x, dist + x._edge.length) for x in reversed(children))
+            continue
+        if dist < t_min[1]:
+            t_min = (node.taxon.label, dist)
+        if dist > t_max[1]:
+            t_max = (node.taxon.label, dist)
     return (math.isclose(t_min[1], t_max[1], rel_tol=tolerance), (t_min, t_max))
 
 
+def edge_lengths_array(edges):
+    """Returns a NumPy array of the lengths of each edge in `edges`."""
+    return np.fromiter((x.length for x in edges), dtype=np.float64, count=len(edges))
+
+
 def get_short_branches(node):
-    """Yields an iterator of especially short edges under `node`."""
-    for edge in edge_iter(node):
-        if edge.length <= 0.001:
-            yield edge
+    """Returns a list of especially short edges under `node`."""
+    edges = _clade_edges(node)
+    return list(compress(edges, edge_lengths_array(edges) <= 0.001))
 
 
 def compute_node_depths(tree):
     """Returns a dictionary of node depths for each node with a label."""
+    # Count labeled ancestors in a single preorder pass rather than walking up from every leaf
+    depths = {}
     res = {}
-    for leaf in tree.leaf_node_iter():
-        cnt = 0
-        for anc in leaf.ancestor_iter():
-            if anc.label:
-                cnt += 1
-        res[leaf.taxon.label] = cnt
+    for node in tree.preorder_node_iter():
+        parent = node.parent_node
+        if parent is None:
+            depth = 0
+        else:
+            depth = depths[id(parent)] + (1 if parent.label else 0)
+        if node._child_nodes:
+            depths[id(node)] = depth
+        else:
+            res[node.taxon.label] = depth
     return res
 
 
@@ -148,36 +344,60 @@ def graft_node(graft_recipient, graft, stem=False):
     3. Seed node must be older than graft node (no negative branches)
     4. Must not be locked (intruding on monophyly)
     """
-
-    def filter_fn(x):
-        return x.head_node.age <= graft.age and x.head_node.parent_node.age >= graft.age and x.label != "locked"
-
-    all_edges = list(edge_iter(graft_recipient))
+    crown = _splice_graft(graft_recipient, graft, stem)
+    # only the graft and its ancestors gained new tips and node ages
+    _invalidate_up(graft)
+    return crown
+
+
+def _splice_graft(graft_recipient, graft, stem):
+    """Places `graft` in the clade under `graft_recipient` as in `graft_node`, leaving cached values alone."""
+    graft_age = graft.age
+
+    # Node ages decrease towards the tips, so an edge whose tail is younger than the
+    # graft can only have younger edges below it. Prune those subtrees from the search.
+    # Since we only descend from nodes at least as old as the graft, every edge we
+    # visit has a tail old enough, and only the head and lock state need checking.
+    eligible_nodes = []
+    stack = list(graft_recipient._child_nodes) if graft_recipient.age >= graft_age else []
+    while stack:
+        child = stack.pop()
+        age = child.age
+        if age <= graft_age and child._edge._label != "locked":
+            eligible_nodes.append(child)
+        if age >= graft_age:
+            stack.extend(child._child_nodes)
     if stem:
         # also include the crown node's subtending edge
-        all_edges.append(graft_recipient.edge)
-    eligible_edges = [x for x in all_edges if filter_fn(x)]
-
-    if not eligible_edges:
+        edge = graft_recipient._edge
+        if (
+            graft_recipient.age <= graft_age
+            and graft_recipient._parent_node.age >= graft_age
+            and edge._label != "locked"
+        ):
+            eligible_nodes.append(graft_recipient)
+
+    if not eligible_nodes:
         raise Exception(f"could not place node {graft} in clade {graft_recipient}")
 
-    focal_node = random.choice([x.head_node for x in eligible_edges])
+    focal_node = random.choice(eligible_nodes)
     seed_node = focal_node.parent_node
-    sisters = focal_node.sibling_nodes()
 
     # pick a child edge and detach its corresponding node
     #
-    # DendroPy's Node.remove_child() messes with the edge lengths.
-    # But, Node.clear_child_nodes() simply cuts that bit of the tree out.
-    seed_node.clear_child_nodes()
+    # DendroPy's Node.remove_child() messes with the edge lengths, and
+    # Node.set_child_nodes() rechecks every child for duplicates. Instead,
+    # edit the seed node's child list directly to cut that bit of the tree out.
+    children = seed_node._child_nodes
+    children[:] = [x for x in children if x is not focal_node]
 
     # set the correct edge length on the grafted node and make the grafted
     # node a child of the seed node
     graft.edge.length = seed_node.age - graft.age
     if graft.edge.length < 0:
         raise Exception("negative branch length")
-    sisters.append(graft)
-    seed_node.set_child_nodes(sisters)
+    children.append(graft)
+    graft._parent_node = seed_node
 
     # make the focal node a child of the grafted node and set edge length
     focal_node.edge.length = graft.age - focal_node.age
@@ -191,14 +411,37 @@ def graft_node(graft_recipient, graft, stem=False):
     return graft_recipient
 
 
+def graft_nodes(graft_recipient, grafts, stem=False):
+    """
+    Grafts each node in `grafts` randomly in the subtree below node
+    `graft_recipient`, as in `graft_node`. Grafts are placed in order from
+    oldest to youngest.
+
+    Returns the (potentially new) crown of the clade.
+    """
+    grafts = sorted(grafts, key=lambda x: x.age, reverse=True)
+    for graft in grafts:
+        graft_recipient = _splice_graft(graft_recipient, graft, stem)
+    # Splicing never reads the node caches, so clear them once all grafts are placed. The grafts
+    # share most of their ancestors, so stop walking up at the first node that was already cleared.
+    cleared = set()
+    for graft in grafts:
+        for x in graft.ancestor_iter(inclusive=True):
+            if id(x) in cleared:
+                break
+            cleared.add(id(x))
+            _clear_node_caches(x)
+    return graft_recipient
+
+
 def lock_clade(node, stem=False):
     """
     Locks a clade descending from `node` so future grafts will avoid locked edges.
     """
     for edge in edge_iter(node):
-        edge.label = "locked"
+        edge._label = "locked"
     if stem:
-        node.edge.label = "locked"
+        node.edge._label = "locked"
 
 
 def unlock_clade(node, stem=False):
@@ -206,21 +449,21 @@ def unlock_clade(node, stem=False):
     Unlocks a clade descending from `node` so new tips can be grafted to its edges.
     """
     for edge in edge_iter(node):
-        edge.label = ""
+        edge._label = ""
     if stem:
-        node.edge.label = ""
+        node.edge._label = ""
 
 
 def count_locked(node):
     """How many edges under `node` are locked?"""
-    sum([x.label == "locked" for x in edge_iter(node)])
+    return sum(1 for x in edge_iter(node) if x._label == "locked")
 
 
 def is_fully_locked(node):
     """
     Are all the edges below `node` locked?
     """
-    return all(x.label == "locked" for x in edge_iter(node))
+    return all(x._label == "locked" for x in edge_iter(node))
 
 
 def get_min_age(node):
@@ -239,12 +482,69 @@ def get_min_age(node):
     return interval.lower
 
 
+@dataclass(frozen=True)
+class AgeIntervals:
+    """
+    A union of closed age intervals, stored as sorted arrays of the `lowers`
+    and `uppers` bounds of each disjoint component.
+    """
+
+    lowers: np.ndarray
+    uppers: np.ndarray
+
+    @property
+    def empty(self):
+        """Does this union contain no intervals at all?"""
+        return len(self.lowers) == 0
+
+    @property
+    def atomic(self):
+        """Is this union a single interval? The empty interval is considered atomic."""
+        return len(self.lowers) <= 1
+
+    @property
+    def lower(self):
+        """The lower bound of the union, or infinity if it is empty."""
+        if self.empty:
+            return math.inf
+        return float(self.lowers[0])
+
+    def __str__(self):
+        if self.empty:
+            return "()"
+        return " | ".join(f"[{lo},{hi}]" for lo, hi in zip(self.lowers.tolist(), self.uppers.tolist()))
+
+
+def merge_intervals(lowers, uppers):
+    """
+    Merges the closed intervals given by the arrays `lowers` and `uppers`
+    into an `AgeIntervals` of disjoint components.
+    """
+    keep = lowers <= uppers
+    lowers = lowers[keep]
+    uppers = uppers[keep]
+    if len(lowers) == 0:
+        return AgeIntervals(lowers, uppers)
+    order = np.argsort(lowers, kind="stable")
+    lowers = lowers[order]
+    reach = np.maximum.accumulate(uppers[order])
+    # A new component starts wherever an interval begins after everything before it has ended
+    breaks = np.flatnonzero(lowers[1:] > reach[:-1]) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks - 1, [len(lowers) - 1]))
+    return AgeIntervals(lowers[starts], reach[ends])
+
+
 def get_age_intervals(node):
     """
     Gets the (possibly disjoint) interval that could be generated in the
     clade under `node`, assuming that grafts to locked edges are restricted.
     """
-    acc = portion.empty()
-    for edge in edge_iter(node, lambda x: x.label != "locked"):
-        acc = acc | portion.closed(edge.head_node.age, edge.tail_node.age)
-    return acc
+    heads = array("d")
+    tails = array("d")
+    for edge in _clade_edges(node):
+        if edge._label != "locked":
+            head = edge._head_node
+            heads.append(head.age)
+            tails.append(head._parent_node.age)
+    return merge_intervals(np.frombuffer(heads, dtype=np.float64), np.frombuffer(tails, dtype=np.float64))
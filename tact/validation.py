@@ -2,10 +2,9 @@
 
 """Various validation functions for `click` classes and parameters."""
 
-import collections
-
 import click
 import dendropy
+import numpy as np
 
 from .tree_util import compute_node_depths
 from .tree_util import is_binary
@@ -33,13 +32,13 @@ def validate_newick(ctx, param, value, **kwargs):
 def validate_tree_node_depths(ctx, param, value):
     """Validates a DendroPy tree, ensuring that the node depth is equal for all tips."""
     node_depths = compute_node_depths(value)
-    stats = collections.defaultdict(int)
-    for v in node_depths.values():
-        stats[v] += 1
-    if len(stats) > 1:
+    depths, counts = np.unique(
+        np.fromiter(node_depths.values(), dtype=np.intp, count=len(node_depths)), return_counts=True
+    )
+    if len(depths) > 1:
         msg = "The tips of your taxonomy tree do not have equal numbers of ranked clades in their ancestor chain:\n"
-        for k in sorted(stats.keys()):
-            msg += f"* {stats[k]} tips have {k} ranked ancestors\n"
+        for k, n in zip(depths.tolist(), counts.tolist()):
+            msg += f"* {n} tips have {k} ranked ancestors\n"
         raise click.BadParameter(msg)
     return value
 
@@ -1,12 +1,52 @@
 from __future__ import division
 
+import logging
 import os
 import pytest
+import sys
+
+from dendropy import Tree
+
+DATADIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 
 
 @pytest.fixture
 def datadir():
-    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    return DATADIR
+
+
+@pytest.fixture
+def show_tree(pytestconfig):
+    """
+    Returns a function that draws a tree to stderr for debugging, which only does so
+    when pytest runs with -vv.
+    """
+
+    def show(tree):
+        if pytestconfig.getoption("verbose") >= 2:
+            tree.write_ascii_plot(sys.stderr)
+
+    return show
+
+
+@pytest.fixture(scope="session")
+def input_trees():
+    """
+    Returns a function that parses the taxonomy and backbone trees for a test dataset,
+    so that each one is only parsed once per session. Tests should not modify them.
+    """
+    cache = {}
+
+    def load(stem):
+        if stem not in cache:
+            taxed = Tree.get(path=os.path.join(DATADIR, stem + ".taxonomy.tre"), schema="newick")
+            bbone = Tree.get(
+                path=os.path.join(DATADIR, stem + ".backbone.tre"), schema="newick", rooting="default-rooted"
+            )
+            cache[stem] = (taxed, bbone)
+        return cache[stem]
+
+    return load
 
 
 @pytest.fixture
@@ -47,3 +87,17 @@ def birth():
 @pytest.fixture
 def death():
     return 0.0
+
+
+@pytest.fixture(autouse=True)
+def reset_cli_loggers():
+    """
+    Removes the handlers that the command line scripts attach to their module loggers, so that
+    in-process script runs don't write into each other's log files.
+    """
+    yield
+    for name in ("tact.cli_add_taxa", "tact.cli_add_toml"):
+        logger = logging.getLogger(name)
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+            handler.close()
@@ -1,111 +1,114 @@
 import pytest
-import sys
+import csv
 import os
 
+import numpy as np
 from dendropy import Tree
 
 execution_number = range(2)
 
 
-def run_tact(script_runner, datadir, stem):
-    backbone = os.path.join(datadir, stem + ".backbone.tre")
-    taxonomy = os.path.join(datadir, stem + ".taxonomy.tre")
-    taxed = Tree.get(path=taxonomy, schema="newick")
-    bbone = Tree.get(path=backbone, schema="newick", rooting="default-rooted")
-    result = script_runner.run(
-        "tact_add_taxa", "--taxonomy", taxonomy, "--backbone", backbone, "--output", ".tact-pytest-" + stem, "-vv"
-    )
-    assert result.returncode == 0
-    output = ".tact-pytest-" + stem + ".newick.tre"
-    tacted = Tree.get(path=output, schema="newick", rooting="default-rooted")
-    ss = tacted.as_ascii_plot()
-    sys.stderr.write(ss)
-    result = script_runner.run(
-        "tact_check_results",
-        output,
-        "--taxonomy",
-        taxonomy,
-        "--backbone",
-        backbone,
-        "--output",
-        ".tact-pytest-" + stem + ".check.csv",
-        "--cores=1",
-    )
-    assert result.returncode == 0
-    return (tacted, taxed, bbone)
+@pytest.fixture
+def run_tact(script_runner, datadir, tmp_path, input_trees, show_tree):
+    def run(stem, *args):
+        prefix = str(tmp_path / stem)
+        backbone = os.path.join(datadir, stem + ".backbone.tre")
+        taxonomy = os.path.join(datadir, stem + ".taxonomy.tre")
+        taxed, bbone = input_trees(stem)
+        result = script_runner.run(
+            "tact_add_taxa",
+            "--taxonomy",
+            taxonomy,
+            "--backbone",
+            backbone,
+            "--output",
+            prefix,
+            "-vv",
+            *args,
+        )
+        assert result.returncode == 0
+        output = prefix + ".newick.tre"
+        tacted = Tree.get(path=output, schema="newick", rooting="default-rooted")
+        show_tree(tacted)
+        result = script_runner.run(
+            "tact_check_results",
+            output,
+            "--taxonomy",
+            taxonomy,
+            "--backbone",
+            backbone,
+            "--output",
+            prefix + ".check.csv",
+            "--cores=1",
+        )
+        assert result.returncode == 0
+        return (tacted, taxed, bbone)
+
+    return run
 
 
 @pytest.mark.parametrize("execution_number", execution_number)
-def test_yule(script_runner, execution_number, datadir):
-    backbone = os.path.join(datadir, "stem2.backbone.tre")
-    taxonomy = os.path.join(datadir, "stem2.taxonomy.tre")
-    taxed = Tree.get(path=taxonomy, schema="newick")
-    bbone = Tree.get(path=backbone, schema="newick", rooting="default-rooted")
-    result = script_runner.run(
-        "tact_add_taxa",
-        "--taxonomy",
-        taxonomy,
-        "--backbone",
-        backbone,
-        "--output",
-        ".tact-pytest-yule",
-        "-vv",
-        "--yule",
-    )
-    assert result.returncode == 0
-    output = ".tact-pytest-yule.newick.tre"
-    tacted = Tree.get(path=output, schema="newick", rooting="default-rooted")
-    ss = tacted.as_ascii_plot()
-    sys.stderr.write(ss)
-    result = script_runner.run(
-        "tact_check_results",
-        output,
-        "--taxonomy",
-        taxonomy,
-        "--backbone",
-        backbone,
-        "--output",
-        ".tact-pytest-yule.check.csv",
-        "--cores=1",
-    )
-    assert result.returncode == 0
-    return (tacted, taxed, bbone)
+def test_yule(run_tact, execution_number):
+    run_tact("stem2", "--yule")
+
+
+def clade_tips(tree):
+    """Maps every node in `tree` to the frozenset of tip labels descending from it, in one postorder pass."""
+    tips = {}
+    for node in tree.postorder_node_iter():
+        if node.is_leaf():
+            tips[node] = frozenset([node.taxon.label])
+        else:
+            tips[node] = frozenset().union(*[tips[x] for x in node.child_node_iter()])
+    return tips
 
 
 @pytest.mark.parametrize("execution_number", execution_number)
 @pytest.mark.parametrize("stem", ["weirdness", "intrusion", "short_branch", "stem"])
-def test_monophyly(script_runner, execution_number, datadir, stem):
-    tacted, taxed, bbone = run_tact(script_runner, datadir, stem)
-    extant = set([x.taxon.label for x in bbone.leaf_nodes()])
+def test_monophyly(run_tact, execution_number, stem):
+    tacted, taxed, bbone = run_tact(stem)
+    # A set of tips is monophyletic exactly when some node subtends that set, so comparing against
+    # every clade at once replaces a root-to-tip `mrca` search per taxonomic node.
+    taxed_tips = clade_tips(taxed)
+    bbone_tips = clade_tips(bbone)
+    bbone_clades = set(bbone_tips.values())
+    tacted_clades = set(clade_tips(tacted).values())
+    extant = bbone_tips[bbone.seed_node]
     for node in taxed.postorder_internal_node_iter(exclude_seed_node=True):
-        expected = set([x.taxon.label for x in node.leaf_nodes()])
+        expected = taxed_tips[node]
         our_extant = extant & expected
-        if len(our_extant) > 0:
-            bbone_node = bbone.mrca(taxon_labels=our_extant)
-            bbone_tips = set([x.taxon.label for x in bbone_node.leaf_nodes()])
-            if bbone_tips != our_extant:
-                continue
-        mrca = tacted.mrca(taxon_labels=expected)
-        actual = set([x.taxon.label for x in mrca.leaf_nodes()])
-        assert expected == actual
+        if len(our_extant) > 0 and our_extant not in bbone_clades:
+            continue
+        assert expected in tacted_clades
 
 
 @pytest.mark.parametrize("execution_number", execution_number)
 @pytest.mark.parametrize("stem", ["weirdness", "short_branch"])
-def test_short_branch(script_runner, execution_number, datadir, stem):
-    tacted, taxed, bbone = run_tact(script_runner, datadir, stem)
-    n_short = 0
-    for leaf in tacted.leaf_node_iter():
-        if leaf.edge.length < 0.1:
-            n_short += 1
+def test_short_branch(run_tact, execution_number, stem):
+    tacted, taxed, bbone = run_tact(stem)
+    leaves = tacted.leaf_nodes()
+    lengths = np.fromiter((x.edge.length for x in leaves), dtype=np.float64, count=len(leaves))
+    n_short = np.count_nonzero(lengths < 0.1)
     assert n_short <= 20
 
 
 @pytest.mark.parametrize("execution_number", execution_number)
-def test_stem_clade_attachment(script_runner, execution_number, datadir):
-    tacted, taxed, bbone = run_tact(script_runner, datadir, "stem2")
+def test_stem_clade_attachment(run_tact, execution_number):
+    tacted, taxed, bbone = run_tact("stem2")
+    # `mrca` encodes bipartitions itself on a freshly parsed tree, so only ages need computing
     tacted.calc_node_ages()
-    tacted.update_bipartitions()
     node = tacted.mrca(taxon_labels=["c1", "c2", "c3", "c4", "c5"])
     ages = [x.age < 15.16 for x in node.postorder_internal_node_iter()]
     assert any(ages)
+
+
+def test_rates_not_shared_between_runs(run_tact, tmp_path, input_trees):
+    # In-process runs share module state, so an earlier run must not leak rates into a later one
+    run_tact("stem2")
+    run_tact("stem")
+    taxed, bbone = input_trees("stem")
+    labels = {x.label for x in taxed.internal_nodes(exclude_seed_node=True)}
+    with open(tmp_path / "stem.rates.csv", encoding="utf-8") as rfile:
+        rows = list(csv.DictReader(rfile))
+    assert rows
+    assert {x["taxon"] for x in rows} <= labels
@@ -41,8 +41,10 @@ from tact.lib import optim_bd
     ],
     sampling=0.06298810337307759,
 )
+# Extreme and subnormal ages are covered by the examples above; generated ages stay within a
+# plausible range so the optimizer doesn't spend most of its time in the exact Decimal fallback
 @given(
-    ages=st.lists(st.floats(min_value=0, allow_infinity=False, allow_nan=False, exclude_min=True), min_size=1).map(
+    ages=st.lists(st.floats(min_value=1e-9, max_value=1e6, allow_subnormal=False), min_size=1, max_size=64).map(
         sorted
     ),
     sampling=st.floats(min_value=1e-9, max_value=1),
@@ -59,3 +61,8 @@ def test_birth_death(ages, sampling, birth, death):
     b, d = optim_bd(ages, sampling)
     assert d == death
     assert math.isclose(b, birth, rel_tol=1e-8)
+
+
+def test_birth_death_memoized(ages, sampling):
+    # Same ages in a different order and container give the same result
+    assert optim_bd(ages, sampling) == optim_bd(tuple(reversed(ages)), sampling)
@@ -15,3 +15,17 @@ def test_disjoint(datadir):
 
     res = get_age_intervals(tree.seed_node)
     assert not res.atomic
+
+
+def test_atomic(datadir):
+    disjoint_tree = os.path.join(datadir, "disjoint.tre")
+    tree = get_tree(disjoint_tree)
+
+    res = get_age_intervals(tree.seed_node)
+    assert res.atomic
+    assert res.lower == 0.0
+
+    lock_clade(tree.seed_node)
+    res = get_age_intervals(tree.seed_node)
+    assert res.empty
+    assert res.atomic
@@ -1,8 +1,12 @@
 from __future__ import division
+import math
+import sys
+
 import pytest
 from hypothesis import given, assume
 import hypothesis.strategies as st
 
+import tact.lib
 from tact.lib import p1, p1_orig, p1_exact, lik_constant
 
 
@@ -29,3 +33,24 @@ def test_lik_constants(birth, death, sampling, ages):
     assert lik_constant((birth, death), sampling, ages, p1=p1) == pytest.approx(
         lik_constant((birth, death), sampling, ages, p1=p1_orig)
     )
+
+
+@pytest.mark.parametrize(
+    "t, l, m",
+    # Either side of where `exp(-(l - m) * t)` underflows (for l > m) or overflows (for l < m)
+    [(t, 1.0, 0.0) for t in (700, 708.5, 709, 745, 746, 800)] + [(t, 0.5, 1.5) for t in (700, 709.8, 710, 800)],
+)
+def test_p1_float_limits(t, l, m):  # noqa: E741
+    expected = float(p1_exact(t, l, m, 0.5)) or sys.float_info.min
+    assert math.isclose(p1(t, l, m, 0.5), expected, rel_tol=1e-9)
+
+
+@pytest.mark.parametrize("t, l, rho", [(3, 0.3, 0.7), (2, 0.1, 0.123)])
+def test_p1_equal_rates(monkeypatch, t, l, rho):  # noqa: E741
+    # With equal birth and death rates the numerator is exactly zero, which is not an underflow
+    def fail(*args):
+        raise AssertionError("p1_exact should not be needed")
+
+    expected = p1_orig(t, l, l, rho)
+    monkeypatch.setattr(tact.lib, "p1_exact", fail)
+    assert p1(t, l, l, rho) == expected == sys.float_info.min
@@ -0,0 +1,140 @@
+import os
+
+import dendropy
+import pytest
+
+from tact.tree_util import (
+    calc_node_ages,
+    compute_node_depths,
+    count_locked,
+    edge_iter,
+    get_ages,
+    get_monophyletic_node,
+    get_tip_labels,
+    get_tree,
+    graft_node,
+    graft_nodes,
+    is_fully_locked,
+    lock_clade,
+    update_tree_view,
+    update_tree_view_local,
+)
+
+
+def graft_d1(tree):
+    """Grafts a new tip D1 at age 2.5 into the clade of C1 and C2, returning the clade's crown."""
+    new_node = dendropy.Node()
+    new_node.age = 2.5
+    new_leaf = new_node.new_child(taxon=tree.taxon_namespace.require_taxon("D1"), edge_length=2.5)
+    new_leaf.age = 0
+    return graft_node(tree.mrca(taxon_labels=["C1", "C2"]), new_node)
+
+
+def test_get_ages_cache_invalidated(datadir):
+    tree = get_tree(os.path.join(datadir, "disjoint.tre"))
+    ages = get_ages(tree.seed_node).tolist()
+    assert ages == sorted(ages, reverse=True)
+    assert get_ages(tree.seed_node, include_root=True).tolist() == ages + [tree.seed_node.age]
+    with pytest.raises(ValueError):
+        get_ages(tree.seed_node).sort()
+
+    graft_d1(tree)
+    assert len(get_ages(tree.seed_node)) == len(ages) + 1
+    update_tree_view(tree)
+    assert len(get_ages(tree.seed_node)) == len(ages) + 1
+
+
+def test_tip_labels_invalidated_by_graft(datadir):
+    tree = get_tree(os.path.join(datadir, "disjoint.tre"))
+    recipient = tree.mrca(taxon_labels=["C1", "C2"])
+    assert get_tip_labels(recipient) == {"C1", "C2"}
+    assert get_tip_labels(tree) == {"A1", "A2", "B1", "B2", "C1", "C2"}
+
+    graft_d1(tree)
+    assert get_tip_labels(recipient) == {"C1", "C2", "D1"}
+    assert "D1" in get_tip_labels(tree)
+
+
+def test_tip_labels_filled_below(datadir):
+    tree = get_tree(os.path.join(datadir, "disjoint.tre"))
+    get_tip_labels(tree)
+    for node in tree.preorder_node_iter():
+        assert get_tip_labels(node) == {x.taxon.label for x in node.leaf_iter()}
+
+
+def test_edges_invalidated_by_graft(datadir):
+    tree = get_tree(os.path.join(datadir, "disjoint.tre"))
+    recipient = tree.mrca(taxon_labels=["C1", "C2"])
+    n_edges = len(list(edge_iter(tree.seed_node)))
+    assert len(list(edge_iter(recipient))) == 2
+
+    graft_d1(tree)
+    assert len(list(edge_iter(recipient))) == 4
+    assert len(list(edge_iter(tree.seed_node))) == n_edges + 2
+
+
+def test_count_locked(datadir):
+    tree = get_tree(os.path.join(datadir, "disjoint.tre"))
+    assert count_locked(tree.seed_node) == 0
+    assert not is_fully_locked(tree.seed_node)
+    lock_clade(tree.mrca(taxon_labels=["B1", "B2"]), stem=True)
+    assert count_locked(tree.seed_node) == 3
+    lock_clade(tree.seed_node)
+    assert count_locked(tree.seed_node) == len(list(edge_iter(tree.seed_node)))
+    assert is_fully_locked(tree.seed_node)
+
+
+def test_compute_node_depths():
+    tree = dendropy.Tree.get(data="(((a,b)X,(c)Y)Z,(d,e)W)R;", schema="newick")
+    assert compute_node_depths(tree) == {"a": 3, "b": 3, "c": 3, "d": 2, "e": 2}
+
+
+def test_monophyletic_node_cache_invalidated(datadir):
+    tree = get_tree(os.path.join(datadir, "disjoint.tre"))
+    recipient = tree.mrca(taxon_labels=["C1", "C2"])
+    assert get_monophyletic_node(tree, {"C1", "C2"}) is recipient
+    assert get_monophyletic_node(tree, {"B1", "C1"}) is None
+
+    graft_d1(tree)
+    assert get_monophyletic_node(tree, {"C1", "C2"}) is None
+    assert get_monophyletic_node(tree, {"C1", "C2", "D1"}) is recipient
+
+
+def test_calc_node_ages_matches_dendropy(datadir):
+    tree = get_tree(os.path.join(datadir, "disjoint.tre"))
+    tree.calc_node_ages(is_force_max_age=True)
+    expected = [x.age for x in tree.preorder_node_iter()]
+    for node in tree.preorder_node_iter():
+        node.age = None
+    calc_node_ages(tree)
+    assert [x.age for x in tree.preorder_node_iter()] == expected
+
+
+def test_update_tree_view_local(datadir):
+    tree = get_tree(os.path.join(datadir, "disjoint.tre"))
+    crown = graft_d1(tree)
+    assert update_tree_view_local(tree, crown) == {"A1", "A2", "B1", "B2", "C1", "C2", "D1"}
+    ages = [x.age for x in tree.preorder_node_iter()]
+    calc_node_ages(tree)
+    assert [x.age for x in tree.preorder_node_iter()] == ages
+    # Bipartitions are stale, but monophyly lookups don't depend on them
+    assert get_monophyletic_node(tree, {"C1", "C2", "D1"}) is crown
+
+
+def test_graft_nodes_invalidates_caches(datadir):
+    tree = get_tree(os.path.join(datadir, "disjoint.tre"))
+    recipient = tree.mrca(taxon_labels=["C1", "C2"])
+    get_tip_labels(tree)
+    n_edges = len(list(edge_iter(tree.seed_node)))
+    grafts = []
+    for label, age in [("D1", 2.5), ("D2", 2.0)]:
+        new_node = dendropy.Node()
+        new_node.age = age
+        new_leaf = new_node.new_child(taxon=tree.taxon_namespace.require_taxon(label), edge_length=age)
+        new_leaf.age = 0
+        grafts.append(new_node)
+    crown = graft_nodes(recipient, grafts)
+    assert get_tip_labels(crown) >= {"C1", "C2", "D1", "D2"}
+    assert len(list(edge_iter(tree.seed_node))) == n_edges + 4
+    for node in tree.preorder_node_iter():
+        assert get_tip_labels(node) == {x.taxon.label for x in node.leaf_iter()}